@@ -7,9 +7,16 @@ from __future__ import print_function
 import os
 import struct
 import array
+import functools
+import selectors
 import threading
 from fcntl import ioctl
 
+try:
+    import pyudev
+except ImportError:  # hotplug is detected by polling /dev/input instead
+    pyudev = None
+
 
 axis_names = {
     0x00: 'x',
@@ -114,6 +121,25 @@ common_names = {
   "z": "ry",
 }
 
+# a bare button name is shorthand for "<name>:pressed"
+BUTTON_EVENT_SUFFIXES = ("", "pressed", "released", "changed")
+
+# struct js_event: __u32 time, __s16 value, __u8 type, __u8 number
+EVENT_FORMAT = "IhBB"
+EVENT_SIZE = struct.calcsize(EVENT_FORMAT)
+
+# js_event.type values; JS_EVENT_INIT is or'ed into the synthetic events
+# reporting each input's initial state
+JS_EVENT_BUTTON = 0x01
+JS_EVENT_AXIS = 0x02
+JS_EVENT_INIT = 0x80
+
+# multiplier mapping a raw axis value onto [-1.0, 1.0]
+AXIS_SCALE = 1.0 / 32767.0
+
+# maximum number of events drained from the device per read
+EVENT_BATCH = 64
+
 device_name_keywords = (
   "game",
   "gaming",
@@ -130,8 +156,14 @@ class Handler:
         self.args = args
         self.kwargs = kwargs
 
+        # bind any extra arguments once, rather than merging them per call
+        if args or kwargs:
+            self._call = functools.partial(fn, *args, **kwargs)
+        else:
+            self._call = fn
+
     def __call__(self, *a, **kw):
-        return self.fn(*(self.args + a), **dict(self.kwargs, **kw))
+        return self._call(*a, **kw)
 
 
 class Gamepad:
@@ -139,18 +171,44 @@ class Gamepad:
     def __init__(self, device=None):
 
         self._device = device
-        self._file = None
+        self._fd = None
         self._name = ""
         self._handlers = []
+        self._button_handlers = []  # see _index_handlers
+        self._axis_handlers = []
+        self._has_button_handlers = False
+        self._has_axis_handlers = False
+        self._index_lock = threading.Lock()
         self._connected = False
 
         self._num_axes = 0
         self._axis_map = []
-        self._axis_states = {}
+        self._axis_names = []  # common name (or None) per axis number
+        self._axis_states = array.array('h')  # raw values by axis number
+        self._axis_lookup = {}  # common name -> axis number
 
         self._num_buttons = 0
         self._button_map = []
-        self._button_states = {}
+        self._button_names = []  # common name (or None) per button number
+        self._button_states = array.array('B')  # indexed by button number
+        self._button_lookup = {}  # common name -> button number
+
+        # wakes the worker thread when the connected device has events or,
+        # if pyudev is available, when an input device is added or removed
+        self._selector = selectors.DefaultSelector()
+        self._monitor = None
+
+        if pyudev:
+            try:
+                monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+                monitor.filter_by("input")
+                monitor.start()
+            except (ImportError, EnvironmentError):
+                # libudev or the netlink socket is unavailable; poll instead
+                pass
+            else:
+                self._monitor = monitor
+                self._selector.register(monitor, selectors.EVENT_READ)
 
         self._thread = threading.Thread(target=self._thread_worker)
         self._thread.setDaemon(True)
@@ -164,122 +222,204 @@ class Gamepad:
                 yield os.path.join("/dev/input", filename)
 
     def _open_device(self, device):
-        return open(device, "rb")
+        # a raw fd: events are read with os.read, so a buffered file object
+        # would only add overhead
+        return os.open(device, os.O_RDONLY | os.O_NONBLOCK)
 
-    def _get_name(self, _file):
+    def _get_name(self, fd):
         buf = array.array('B', [0] * 64)
-        ioctl(_file, 0x80006a13 + (0x10000 * len(buf)), buf)
+        ioctl(fd, 0x80006a13 + (0x10000 * len(buf)), buf)
         return buf.tobytes().decode("utf-8")
 
-    def _get_num_axes(self, _file):
+    def _get_num_axes(self, fd):
         buf = array.array('B', [0])
-        ioctl(_file, 0x80016a11, buf)  # JSIOCGAXES
+        ioctl(fd, 0x80016a11, buf)  # JSIOCGAXES
         return buf[0]
 
-    def _get_num_buttons(self, _file):
+    def _get_num_buttons(self, fd):
         buf = array.array('B', [0])
-        ioctl(_file, 0x80016a12, buf)  # JSIOCGBUTTONS
+        ioctl(fd, 0x80016a12, buf)  # JSIOCGBUTTONS
         return buf[0]
 
-    def _init_axis_map(self, _file):
+    def _init_axis_map(self, fd):
         buf = array.array('B', [0] * 0x40)
-        ioctl(_file, 0x80406a32, buf)  # JSIOCGAXMAP
-
-        for axis in buf[:self._get_num_axes(_file)]:
-            axis_name = axis_names.get(axis, 'unknown(0x%02x)' % axis)
-            self._axis_map.append(axis_name)
-            self._axis_states[axis_name] = 0.0
-
-    def _init_button_map(self, _file):
-        buf = array.array('H', [0] * 200)
-        ioctl(_file, 0x80406a34, buf)  # JSIOCGBTNMAP
+        ioctl(fd, 0x80406a32, buf)  # JSIOCGAXMAP
 
-        for button in buf[:self._get_num_buttons(_file)]:
-            button_name = button_names.get(button, 'unknown(0x%03x)' % button)
-            self._button_map.append(button_name)
-            self._button_states[button_name] = False
+        # build everything in locals and publish it in one go: on() may be
+        # indexing handlers from another thread while this runs
+        axis_map = []
+        names = []
 
-    # event handlers
-    def _handle_button_event(self, button, value):
-        for h in self._handlers:
-            if (
-              h.event == common_names[button] or
-              h.event == common_names[button] + ":pressed"):
+        for axis in buf[:self._num_axes]:
+            axis_name = axis_names.get(axis, 'unknown(0x%02x)' % axis)
+            axis_map.append(axis_name)
+            names.append(common_names.get(axis_name))
 
-                h(value, h.event)
+        self._axis_states = array.array('h', [0] * self._num_axes)
+        self._axis_lookup = {
+            name: number for number, name in enumerate(names) if name}
+        self._axis_map = axis_map
+        self._axis_names = names
 
-    def _handle_button_released_event(self, button, value):
-        for h in self._handlers:
-            if h.event == common_names[button] + ":released":
-                h(value, h.event)
+    def _init_button_map(self, fd):
+        buf = array.array('H', [0] * 200)
+        ioctl(fd, 0x80406a34, buf)  # JSIOCGBTNMAP
 
-    def _handle_button_changed_event(self, button, value):
-        for h in self._handlers:
-            if h.event == common_names[button] + ":changed":
-                h(value, h.event)
+        button_map = []
+        names = []
 
-    def _handle_axis_event(self, axis, value):
-        for h in self._handlers:
-            if h.event == common_names[axis]:
-                h(value, h.event)
+        for button in buf[:self._num_buttons]:
+            button_name = button_names.get(button, 'unknown(0x%03x)' % button)
+            button_map.append(button_name)
+            names.append(common_names.get(button_name))
+
+        self._button_states = array.array('B', [0] * self._num_buttons)
+        self._button_lookup = {
+            name: number for number, name in enumerate(names) if name}
+        self._button_map = button_map
+        self._button_names = names
+
+    def _index_handlers(self):
+        # Flatten the registered handlers into tables specialised for the
+        # connected device: one entry per button/axis number holding the
+        # handlers to call, so dispatch is a list index and nothing more.
+        #
+        # Both the worker (on connect) and on() rebuild the tables. The lock
+        # orders the rebuilds, so the one that runs last is always built
+        # from the current device's names.
+
+        with self._index_lock:
+            button_names = self._button_names
+            axis_names = self._axis_names
+
+            buttons = [{"changed": [], "pressed": [], "released": []}
+                       for _ in button_names]
+            axes = [[] for _ in axis_names]
+
+            for handler in self._handlers:
+                name, _, suffix = handler.event.partition(":")
+
+                if suffix in BUTTON_EVENT_SUFFIXES:
+                    for number, button in enumerate(button_names):
+                        if button == name:
+                            key = suffix or "pressed"
+                            buttons[number][key].append(handler)
+
+                if not suffix:
+                    for number, axis in enumerate(axis_names):
+                        if axis == name:
+                            axes[number].append(handler)
+
+            # (changed, pressed, released) per button number
+            self._button_handlers = [
+                (tuple(b["changed"]), tuple(b["pressed"]),
+                 tuple(b["released"]))
+                for b in buttons]
+            self._axis_handlers = [tuple(a) for a in axes]
+
+            # let _read_device skip dispatch outright for a gamepad that is
+            # only ever polled through button() and axis()
+            self._has_button_handlers = any(map(any, self._button_handlers))
+            self._has_axis_handlers = any(self._axis_handlers)
 
     def _read_device(self):
-        event_buf = self._file.read(8)
-        if (event_buf):
-            ts, value, event_type, number = struct.unpack("IhBB", event_buf)
+        # joydev hands back every pending event in a single read, so drain
+        # up to EVENT_BATCH of them per syscall instead of one at a time
+        try:
+            event_buf = os.read(self._fd, EVENT_SIZE * EVENT_BATCH)
+        except BlockingIOError:
+            return
+
+        # Bind everything the loop touches to locals up front: with the read
+        # batched, this loop is the hot path and attribute lookups on self
+        # are a measurable share of its cost.
+
+        button_states = self._button_states
+        button_handlers = self._button_handlers
+        has_button_handlers = self._has_button_handlers
+        axis_states = self._axis_states
+        axis_handlers = self._axis_handlers
+        has_axis_handlers = self._has_axis_handlers
+
+        # iter_unpack walks the records in C with no per-batch setup, which
+        # matters most for the common one-or-two-event read
+        for _, value, event_type, number in struct.iter_unpack(
+                EVENT_FORMAT, event_buf):
+
+            # initial readings carry JS_EVENT_INIT, so they match neither
+            if event_type == JS_EVENT_BUTTON:
+                # store a plain int; button() builds the bool on demand
+                button_states[number] = 1 if value else 0
+
+                if has_button_handlers:
+                    changed, pressed, released = button_handlers[number]
+                    for h in changed:
+                        h(value, h.event)
+                    for h in (pressed if value else released):
+                        h(value, h.event)
+
+            elif event_type == JS_EVENT_AXIS:
+                # keep the raw value; scale only for handlers and axis()
+                axis_states[number] = value
+
+                if has_axis_handlers and axis_handlers[number]:
+                    fvalue = value * AXIS_SCALE
+                    for h in axis_handlers[number]:
+                        h(fvalue, h.event)
 
-            if event_type & 0x80:  # initial reading
-                return
+    def _connect_to_device(self, device_path):
+        fd = self._open_device(device_path)
+        try:
+            name = self._get_name(fd)
+        except IOError:
+            os.close(fd)
+            raise
+
+        lname = name.lower()
+        if any(kw in lname for kw in device_name_keywords):
+            self._device = device_path
+            self._fd = fd
+            self._selector.register(fd, selectors.EVENT_READ)
+            self._connected = True
+            self._on_connect()
+        else:
+            os.close(fd)
 
-            if event_type & 0x81:  # button
-                button = self._button_map[number]
-                if button:
-                    self._button_states[button] = bool(value)
-                    self._handle_button_changed_event(button, value)
-                    if value:
-                        self._handle_button_event(button, value)
-                    else:
-                        self._handle_button_released_event(button, value)
-
-            if event_type & 0x02:  # axis
-                axis = self._axis_map[number]
-                if axis:
-                    fvalue = value / 32767.0
-                    self._axis_states[axis] = fvalue
-                    self._handle_axis_event(axis, fvalue)
+    def _disconnect(self):
+        if not self._connected:
+            return
 
-    def _connect_to_device(self, device_path):
-        _file = self._open_device(device_path)
-        name = self._get_name(_file)
-
-        for kw in device_name_keywords:
-            if kw in name.lower():
-                self._device = device_path
-                self._file = _file
-                self._connected = True
-                self._on_connect()
-                return
+        self._connected = False
+        self._selector.unregister(self._fd)
+        os.close(self._fd)
+        self._fd = None
+        self._on_disconnect()
 
     def _update_connection(self):
-        if not (self._device and
-                os.path.exists(self._device) and
-                self._connected):
-
-            self._connected = False
+        if self._connected:
+            if os.path.exists(self._device):
+                return
+            self._disconnect()
 
-            # If the user specifies a device path, use it. Otherwise, make an
-            # educated guess
+        # If the user specifies a device path, use it. Otherwise, make an
+        # educated guess
 
-            if self._device:
-                self._connect_to_device(self._device)
-            else:
-                for device_path in self._get_device_list():
-                    self._connect_to_device(device_path)
+        if self._device:
+            self._connect_to_device(self._device)
+        else:
+            for device_path in self._get_device_list():
+                self._connect_to_device(device_path)
+                if self._connected:
+                    break
 
     def _on_connect(self):
-        self._init_button_map(self._file)
-        self._init_axis_map(self._file)
-        self._name = self._get_name(self._file)
+        # the map initialisers rely on the input counts being known
+        self._num_axes = self._get_num_axes(self._fd)
+        self._num_buttons = self._get_num_buttons(self._fd)
+        self._init_axis_map(self._fd)
+        self._init_button_map(self._fd)
+        self._name = self._get_name(self._fd)
+        self._index_handlers()
 
         # notify the user that this gamepad is connected
 
@@ -292,15 +432,53 @@ class Gamepad:
             if handler.event == "disconnect":
                 handler()
 
-    def _thread_worker(self, *args):
+    def _handle_udev_events(self):
         while (1):
+            device = self._monitor.poll(timeout=0)
+            if device is None:
+                return
+
+            # additions are picked up by _update_connection on the next
+            # pass through the worker loop
+            if (device.action == "remove" and
+                    device.device_node == self._device):
+                self._disconnect()
+
+    def _worker_step(self):
+        if not self._connected:
             try:
                 self._update_connection()
-                if self._connected:
-                    self._read_device()
             except IOError:
-                if self.connected:
-                    self._on_disconnect()
+                pass
+
+        # Block in the kernel until the device has events or udev reports
+        # an input device coming or going. Without pyudev, wake up
+        # periodically to poll for hotplug instead.
+
+        if self._monitor:
+            timeout = None
+        elif self._connected:
+            timeout = 0.5
+        else:
+            timeout = 1
+
+        try:
+            ready = self._selector.select(timeout)
+
+            if not ready and self._connected:
+                self._update_connection()
+
+            for key, _ in ready:
+                if key.fileobj is self._monitor:
+                    self._handle_udev_events()
+                elif self._connected:
+                    self._read_device()
+        except IOError:
+            self._disconnect()
+
+    def _thread_worker(self, *args):
+        while (1):
+            self._worker_step()
 
     # public methods/properties
 
@@ -321,23 +499,21 @@ class Gamepad:
         return common_names.values()
 
     def axis(self, axis):
-        if self._connected:
-            for k, v in self._axis_states.items():
-                if common_names[k] == axis:
-                    return v
+        if self._connected and axis in self._axis_lookup:
+            return self._axis_states[self._axis_lookup[axis]] * AXIS_SCALE
         else:
             return 0.0
 
     def button(self, button):
-        if self._connected:
-            for k, v in self._button_states.items():
-                if common_names[k] == button:
-                    return bool(v)
+        if self._connected and button in self._button_lookup:
+            return bool(self._button_states[self._button_lookup[button]])
         else:
             return False
 
     def on(self, event, handler, *args, **kwargs):
-        self._handlers.append(Handler(event, handler, *args, **kwargs))
+        h = Handler(event, handler, *args, **kwargs)
+        self._handlers.append(h)
+        self._index_handlers()
 
     def watch_all(self):
 
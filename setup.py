@@ -44,6 +44,9 @@ setup(
         ],
     },
     install_requires=requirements,
+    extras_require={
+        'udev': ['pyudev'],
+    },
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
@@ -3,12 +3,113 @@
 
 """Tests for `gamepad` package."""
 
+import os
+import struct
+
 import pytest
 
 from click.testing import CliRunner
 
-# from gamepad import Gamepad
+from gamepad import Gamepad
 from gamepad import cli
+from gamepad import gamepad as gamepad_module
+
+
+AXIS_MAP = [0x00, 0x01, 0x10, 0x11]  # x, y, hat0x, hat0y
+BUTTON_MAP = [0x120, 0x121, 0x126, 0x127]  # trigger, thumb, base, base2
+
+
+def fake_ioctl(_file, request, buf):
+    """Answer the joydev ioctls with a small, fixed controller layout."""
+    if request == 0x80016a11:  # JSIOCGAXES
+        buf[0] = len(AXIS_MAP)
+    elif request == 0x80016a12:  # JSIOCGBUTTONS
+        buf[0] = len(BUTTON_MAP)
+    elif request == 0x80406a32:  # JSIOCGAXMAP
+        buf[:len(AXIS_MAP)] = type(buf)(buf.typecode, AXIS_MAP)
+    elif request == 0x80406a34:  # JSIOCGBTNMAP
+        buf[:len(BUTTON_MAP)] = type(buf)(buf.typecode, BUTTON_MAP)
+    else:  # JSIOCGNAME
+        name = b"Test Gamepad"
+        buf[:len(name)] = type(buf)(buf.typecode, name)
+    return 0
+
+
+def event(value, event_type, number):
+    return struct.pack("IhBB", 0, value, event_type, number)
+
+
+class FakeUdevDevice:
+    def __init__(self, action, device_node):
+        self.action = action
+        self.device_node = device_node
+
+
+class FakeMonitor:
+    """Stands in for pyudev.Monitor; readable whenever events are queued."""
+
+    def __init__(self):
+        self._r, self._w = os.pipe()
+        self.events = []
+
+    @classmethod
+    def from_netlink(cls, context):
+        return cls()
+
+    def filter_by(self, subsystem):
+        assert subsystem == "input"
+
+    def start(self):
+        pass
+
+    def fileno(self):
+        return self._r
+
+    def push(self, action, device_node):
+        self.events.append(FakeUdevDevice(action, device_node))
+        os.write(self._w, b"x")
+
+    def poll(self, timeout=None):
+        if not self.events:
+            return None
+        os.read(self._r, 1)
+        return self.events.pop(0)
+
+
+class FakePyudev:
+    Monitor = FakeMonitor
+
+    @staticmethod
+    def Context():
+        return object()
+
+
+@pytest.fixture
+def fake_udev(monkeypatch):
+    monkeypatch.setattr(gamepad_module, "pyudev", FakePyudev)
+
+
+@pytest.fixture
+def gamepad(tmp_path, monkeypatch):
+    """A Gamepad connected to a FIFO standing in for /dev/input/jsN.
+
+    The background thread is disabled; tests feed events through the
+    returned writer fd and call `_read_device` themselves.
+    """
+    monkeypatch.setattr(gamepad_module, "ioctl", fake_ioctl)
+    monkeypatch.setattr(Gamepad, "_thread_worker", lambda self: None)
+
+    device = str(tmp_path / "js0")
+    os.mkfifo(device)
+    writer = os.open(device, os.O_RDWR)
+
+    gp = Gamepad(device)
+    gp._update_connection()
+    assert gp.connected
+
+    gp.write = lambda *events: os.write(writer, b"".join(events))
+    yield gp
+    os.close(writer)
 
 
 @pytest.fixture
@@ -35,3 +136,123 @@ def test_command_line_interface():
     help_result = runner.invoke(cli.main, ['--help'])
     assert help_result.exit_code == 0
     assert '--help  Show this message and exit.' in help_result.output
+
+
+def test_read_device_drains_batch(gamepad):
+    gamepad.write(
+        event(1, 0x81, 0),  # initial button state, ignored
+        event(1, 0x01, 1),
+        event(32767, 0x02, 0),
+        event(-32767, 0x02, 1),
+    )
+    gamepad._read_device()
+
+    assert gamepad.button("btn1") is False
+    assert gamepad.button("btn2") is True
+    assert gamepad.axis("lx") == 1.0
+    assert gamepad.axis("ly") == -1.0
+
+
+def test_read_device_batch_limit(gamepad):
+    batch = gamepad_module.EVENT_BATCH
+    presses = [event(i % 2, 0x01, 0) for i in range(batch + 1)]
+    gamepad.write(*presses)
+
+    gamepad._read_device()
+    assert gamepad.button("btn1") is True  # last event of the first batch
+
+    gamepad._read_device()
+    assert gamepad.button("btn1") is False
+
+    gamepad._read_device()  # nothing pending; must not block or raise
+
+
+def test_button_handlers(gamepad):
+    calls = []
+    gamepad.on("l1", lambda value, event: calls.append(event))
+    gamepad.on("l1:released", lambda value, event: calls.append(event))
+    gamepad.on("l1:changed", lambda value, event: calls.append(event))
+    gamepad.on("r1:pressed", lambda value, event: calls.append(event))
+
+    gamepad.write(event(1, 0x01, 2), event(0, 0x01, 2), event(1, 0x01, 3))
+    gamepad._read_device()
+
+    assert calls == [
+        "l1:changed", "l1",
+        "l1:changed", "l1:released",
+        "r1:pressed",
+    ]
+
+
+def test_axis_handlers(gamepad):
+    calls = []
+    gamepad.on("dpadx", lambda value, event: calls.append((event, value)))
+
+    gamepad.write(event(-32767, 0x02, 2), event(100, 0x02, 0))
+    gamepad._read_device()
+
+    assert calls == [("dpadx", -1.0)]
+
+
+def test_disconnect(gamepad):
+    calls = []
+    gamepad.on("disconnect", lambda: calls.append("disconnect"))
+
+    gamepad._disconnect()
+    gamepad._disconnect()
+
+    assert not gamepad.connected
+    assert calls == ["disconnect"]
+    assert gamepad.axis("lx") == 0.0
+
+
+def test_unknown_inputs(gamepad):
+    assert gamepad.axis("rx") == 0.0
+    assert gamepad.button("select") is False
+
+
+def test_handler_bound_arguments(gamepad):
+    calls = []
+    gamepad.on("btn1", lambda *a, **kw: calls.append((a, kw)), "pad", n=1)
+
+    gamepad.write(event(1, 0x01, 0))
+    gamepad._read_device()
+
+    assert calls == [(("pad", 1, "btn1"), {"n": 1})]
+
+
+def test_udev_remove_of_other_device(fake_udev, gamepad):
+    timeouts = []
+    select = gamepad._selector.select
+    gamepad._selector.select = lambda timeout: (
+        timeouts.append(timeout) or select(timeout))
+
+    gamepad._monitor.push("remove", "/dev/input/js9")
+    gamepad._worker_step()
+
+    assert timeouts == [None]
+    assert gamepad.connected
+    assert gamepad._monitor.events == []
+
+
+def test_udev_remove_of_our_device(fake_udev, gamepad):
+    calls = []
+    gamepad.on("disconnect", lambda: calls.append("disconnect"))
+
+    gamepad._monitor.push("remove", gamepad.device)
+    gamepad._worker_step()
+
+    assert not gamepad.connected
+    assert calls == ["disconnect"]
+
+
+def test_udev_unavailable(monkeypatch):
+    class BrokenPyudev(FakePyudev):
+        @staticmethod
+        def Context():
+            raise ImportError("libudev.so.1 not found")
+
+    monkeypatch.setattr(gamepad_module, "pyudev", BrokenPyudev)
+    monkeypatch.setattr(Gamepad, "_thread_worker", lambda self: None)
+
+    assert Gamepad()._monitor is None